@@ -1,122 +1,202 @@
+import asyncio
+import atexit
+
+import cachetools
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import orjson
 
 
 class FastAPIClient:
+    # Shared across all instances so every client draws from one
+    # keep-alive connection pool
+    _session = None
+
+    @classmethod
+    def _get_session(cls):
+        """Lazily build the session shared by all instances"""
+        if cls._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=50,
+                max_retries=Retry(total=3, backoff_factor=0.1),
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Content-Type": "application/json"})
+            atexit.register(session.close)
+            cls._session = session
+        return cls._session
+
     def __init__(self, base_url="http://localhost:8000"):
         self.base_url = base_url
+        self.session = self._get_session()
+        # Short-lived cache for the read-only GET helpers; staleness is
+        # bounded by the 1s TTL plus invalidation on this client's own writes
+        self._get_cache = cachetools.TTLCache(maxsize=128, ttl=1.0)
+
+    def invalidate(self):
+        """Drop all cached GET responses"""
+        self._get_cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # The session is shared and closed at interpreter exit, so leaving
+        # the context manager does not tear it down
+        pass
 
     def get_welcome_message(self):
         """Get the welcome message from the root endpoint"""
-        response = requests.get(f"{self.base_url}/")
-        return response.json()
+        cached = self._get_cache.get("welcome")
+        if cached is not None:
+            return cached
+        response = self.session.get(f"{self.base_url}/")
+        result = orjson.loads(response.content)
+        self._get_cache["welcome"] = result
+        return result
 
     def get_all_items(self):
         """Get all items from the server"""
-        response = requests.get(f"{self.base_url}/items/")
-        return response.json()
+        cached = self._get_cache.get("all_items")
+        if cached is not None:
+            return cached
+        response = self.session.get(f"{self.base_url}/items/")
+        result = orjson.loads(response.content)
+        self._get_cache["all_items"] = result
+        return result
+
+    def iter_all_items(self):
+        """Stream all items one at a time via the NDJSON endpoint"""
+        response = self.session.get(
+            f"{self.base_url}/items/",
+            headers={"Accept": "application/x-ndjson"},
+            stream=True,
+        )
+        for line in response.iter_lines():
+            if line:
+                yield orjson.loads(line)
 
     def get_item_by_id(self, item_id):
         """Get a specific item by ID"""
-        response = requests.get(f"{self.base_url}/items/{item_id}")
+        cached = self._get_cache.get(("item", item_id))
+        if cached is not None:
+            return cached
+        response = self.session.get(f"{self.base_url}/items/{item_id}")
         if response.status_code == 404:
             return {"error": "Item not found"}
-        return response.json()
+        result = orjson.loads(response.content)
+        self._get_cache[("item", item_id)] = result
+        return result
 
     def search_items(self, query):
         """Search for items by name"""
-        response = requests.get(
+        cached = self._get_cache.get(("search", query))
+        if cached is not None:
+            return cached
+        response = self.session.get(
             f"{self.base_url}/items/search/", params={"query": query}
         )
-        return response.json()
+        result = orjson.loads(response.content)
+        self._get_cache[("search", query)] = result
+        return result
 
     def create_item(self, item_data):
         """Create a new item"""
-        headers = {"Content-Type": "application/json"}
-        response = requests.post(
-            f"{self.base_url}/items/", data=json.dumps(item_data), headers=headers
-        )
-        return response.json(), response.status_code
+        self.invalidate()
+        response = self.session.post(f"{self.base_url}/items/", data=orjson.dumps(item_data))
+        return orjson.loads(response.content), response.status_code
 
     def update_item(self, item_id, item_data):
         """Update an existing item"""
-        headers = {"Content-Type": "application/json"}
-        response = requests.put(
+        self.invalidate()
+        response = self.session.put(
             f"{self.base_url}/items/{item_id}",
-            data=json.dumps(item_data),
-            headers=headers,
+            data=orjson.dumps(item_data),
         )
         if response.status_code == 404:
             return {"error": "Item not found"}, response.status_code
-        return response.json(), response.status_code
+        return orjson.loads(response.content), response.status_code
 
     def delete_item(self, item_id):
         """Delete an item"""
-        response = requests.delete(f"{self.base_url}/items/{item_id}")
+        self.invalidate()
+        response = self.session.delete(f"{self.base_url}/items/{item_id}")
         if response.status_code == 404:
             return {"error": "Item not found"}, response.status_code
-        return response.json(), response.status_code
-
-
-def demo_client():
-    """Run a demonstration of the client"""
-    client = FastAPIClient()
-
-    # Print welcome message
-    print("\n1. Getting welcome message:")
-    print(client.get_welcome_message())
-
-    # Get all items
-    print("\n2. Getting all items:")
-    print(json.dumps(client.get_all_items(), indent=2))
-
-    # Get item by ID
-    print("\n3. Getting item with ID 2:")
-    print(json.dumps(client.get_item_by_id(2), indent=2))
-
-    # Search for items
-    print("\n4. Searching for items with 'key' in the name:")
-    print(json.dumps(client.search_items("key"), indent=2))
-
-    # Create a new item
-    new_item = {
-        "id": 4,
-        "name": "Monitor",
-        "description": "27-inch 4K display",
-        "price": 349.99,
-        "is_offer": True,
-    }
-    print("\n5. Creating a new item:")
-    result, status_code = client.create_item(new_item)
-    print(f"Status: {status_code}")
-    print(json.dumps(result, indent=2))
-
-    # Update an item
-    updated_item = {
-        "id": 3,
-        "name": "Wireless Mouse",
-        "description": "Ergonomic wireless mouse",
-        "price": 59.99,
-        "is_offer": True,
-    }
-    print("\n6. Updating item with ID 3:")
-    result, status_code = client.update_item(3, updated_item)
-    print(f"Status: {status_code}")
-    print(json.dumps(result, indent=2))
-
-    # Get all items after update
-    print("\n7. Getting all items after update:")
-    print(json.dumps(client.get_all_items(), indent=2))
-
-    # Delete an item
-    print("\n8. Deleting item with ID 2:")
-    result, status_code = client.delete_item(2)
-    print(f"Status: {status_code}")
-    print(json.dumps(result, indent=2))
-
-    # Get all items after deletion
-    print("\n9. Getting all items after deletion:")
-    print(json.dumps(client.get_all_items(), indent=2))
+        return orjson.loads(response.content), response.status_code
+
+
+async def demo_client(base_url="http://localhost:8000"):
+    """Run a demonstration of the client, batching independent calls"""
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=10),
+    ) as client:
+        # Steps 1-4 have no data dependencies, so issue them concurrently
+        welcome, items, item2, search = await asyncio.gather(
+            client.get("/"),
+            client.get("/items/"),
+            client.get("/items/2"),
+            client.get("/items/search/", params={"query": "key"}),
+        )
+
+        print("\n1. Getting welcome message:")
+        print(welcome.json())
+
+        print("\n2. Getting all items:")
+        print(json.dumps(items.json(), indent=2))
+
+        print("\n3. Getting item with ID 2:")
+        print(json.dumps(item2.json(), indent=2))
+
+        print("\n4. Searching for items with 'key' in the name:")
+        print(json.dumps(search.json(), indent=2))
+
+        # The mutating steps depend on each other, so keep them sequential
+        # but on the same pooled client
+        new_item = {
+            "id": 4,
+            "name": "Monitor",
+            "description": "27-inch 4K display",
+            "price": 349.99,
+            "is_offer": True,
+        }
+        print("\n5. Creating a new item:")
+        response = await client.post("/items/", json=new_item)
+        print(f"Status: {response.status_code}")
+        print(json.dumps(response.json(), indent=2))
+
+        updated_item = {
+            "id": 3,
+            "name": "Wireless Mouse",
+            "description": "Ergonomic wireless mouse",
+            "price": 59.99,
+            "is_offer": True,
+        }
+        print("\n6. Updating item with ID 3:")
+        response = await client.put("/items/3", json=updated_item)
+        print(f"Status: {response.status_code}")
+        print(json.dumps(response.json(), indent=2))
+
+        print("\n7. Getting all items after update:")
+        response = await client.get("/items/")
+        print(json.dumps(response.json(), indent=2))
+
+        print("\n8. Deleting item with ID 2:")
+        response = await client.delete("/items/2")
+        print(f"Status: {response.status_code}")
+        print(json.dumps(response.json(), indent=2))
+
+        print("\n9. Getting all items after deletion:")
+        response = await client.get("/items/")
+        print(json.dumps(response.json(), indent=2))
 
 
 if __name__ == "__main__":
@@ -126,6 +206,6 @@ if __name__ == "__main__":
 
     choice = input("Do you want to run the demo? (yes/no): ").lower()
     if choice == "yes" or choice == "y":
-        demo_client()
+        asyncio.run(demo_client())
     else:
         print("Demo cancelled. You can import FastAPIClient in your own scripts.")
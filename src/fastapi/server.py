@@ -1,6 +1,10 @@
-from fastapi import FastAPI, HTTPException, Path, Query
-from pydantic import BaseModel
-from typing import List, Optional
+import os
+from functools import lru_cache
+
+from fastapi import FastAPI, HTTPException, Path, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Optional
+import msgspec
 import uvicorn
 
 # Initialize FastAPI app
@@ -8,18 +12,32 @@ app = FastAPI(
     title="Sample FastAPI Server",
     description="A simple API to learn FastAPI basics",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
 
 
 # Define data models
-class Item(BaseModel):
+class Item(msgspec.Struct):
     id: int
     name: str
-    description: Optional[str] = None
     price: float
+    description: Optional[str] = None
     is_offer: bool = False
 
 
+# Pre-built codec pair: decoding straight into Item and encoding from it
+# happen in one C-level pass instead of Pydantic field-by-field validation
+_item_decoder = msgspec.json.Decoder(Item)
+_encoder = msgspec.json.Encoder()
+
+
+def _json_response(value, status_code=200) -> Response:
+    """Encode a msgspec-compatible value straight to a JSON response."""
+    return Response(
+        _encoder.encode(value), status_code=status_code, media_type="application/json"
+    )
+
+
 # In-memory database
 items_db = {
     1: Item(
@@ -39,6 +57,29 @@ items_db = {
     3: Item(id=3, name="Mouse", price=49.99, is_offer=False),
 }
 
+# Lowercase-name index kept in lockstep with items_db so search_items
+# does not recompute item.name.lower() on every request
+_name_lower = {item_id: item.name.lower() for item_id, item in items_db.items()}
+
+# Version counter bumped on every mutation; it drives the ETags below and
+# keys the caches of pre-encoded response bytes
+_items_version = 0
+
+
+def _bump_items_version():
+    global _items_version
+    _items_version += 1
+
+
+@lru_cache(maxsize=8)
+def _items_payload(version: int) -> bytes:
+    return _encoder.encode(list(items_db.values()))
+
+
+@lru_cache(maxsize=256)
+def _item_payload(version: int, item_id: int) -> bytes:
+    return _encoder.encode(items_db[item_id])
+
 
 # Root endpoint
 @app.get("/")
@@ -47,65 +88,115 @@ async def read_root():
 
 
 # Get all items
-@app.get("/items/", response_model=List[Item])
-async def read_items():
-    return list(items_db.values())
+@app.get("/items/")
+async def read_items(request: Request):
+    # Stream one row per line when the client asks for NDJSON, so peak
+    # memory stays O(1) regardless of how large items_db grows
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            (_encoder.encode(item) + b"\n" for item in items_db.values()),
+            media_type="application/x-ndjson",
+        )
+    # Serve unchanged payloads from the per-version byte cache, and let
+    # clients holding the current ETag skip the body entirely
+    etag = f'W/"{_items_version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    return Response(
+        content=_items_payload(_items_version),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
 
 
 # Get a specific item by ID
-@app.get("/items/{item_id}", response_model=Item)
+@app.get("/items/{item_id}")
 async def read_item(
-    item_id: int = Path(..., description="The ID of the item to retrieve")
+    request: Request,
+    item_id: int = Path(..., description="The ID of the item to retrieve"),
 ):
     if item_id not in items_db:
         raise HTTPException(status_code=404, detail="Item not found")
-    return items_db[item_id]
+    etag = f'W/"{_items_version}:{item_id}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    return Response(
+        content=_item_payload(_items_version, item_id),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
 
 
 # Create a new item
-@app.post("/items/", response_model=Item, status_code=201)
-async def create_item(item: Item):
+@app.post("/items/", status_code=201)
+async def create_item(request: Request):
+    try:
+        item = _item_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     if item.id in items_db:
         raise HTTPException(
             status_code=400, detail=f"Item with ID {item.id} already exists"
         )
     items_db[item.id] = item
-    return item
+    _name_lower[item.id] = item.name.lower()
+    _bump_items_version()
+    return _json_response(item, status_code=201)
 
 
 # Update an item
-@app.put("/items/{item_id}", response_model=Item)
-async def update_item(item_id: int, item: Item):
-    if item_id not in items_db:
+@app.put("/items/{item_id}")
+async def update_item(item_id: int, request: Request):
+    try:
+        item = _item_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if items_db.get(item_id) is None:
         raise HTTPException(status_code=404, detail="Item not found")
     if item_id != item.id:
         raise HTTPException(
             status_code=400, detail="Item ID in path does not match item ID in body"
         )
     items_db[item_id] = item
-    return item
+    _name_lower[item_id] = item.name.lower()
+    _bump_items_version()
+    return _json_response(item)
 
 
 # Delete an item
-@app.delete("/items/{item_id}", response_model=dict)
+@app.delete("/items/{item_id}")
 async def delete_item(item_id: int):
-    if item_id not in items_db:
+    if items_db.pop(item_id, None) is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    del items_db[item_id]
-    return {"message": f"Item {item_id} deleted successfully"}
+    del _name_lower[item_id]
+    _bump_items_version()
+    return ORJSONResponse(content={"message": f"Item {item_id} deleted successfully"})
 
 
 # Search items by name
-@app.get("/items/search/", response_model=List[Item])
+@app.get("/items/search/")
 async def search_items(
     query: str = Query(..., description="Search term to find items by name")
 ):
-    matched_items = [
-        item for item in items_db.values() if query.lower() in item.name.lower()
-    ]
-    return matched_items
+    query_lower = query.lower()
+    # Scan only the name column, then gather the matching records
+    matched_ids = [item_id for item_id, name in _name_lower.items() if query_lower in name]
+    return _json_response([items_db[item_id] for item_id in matched_ids])
 
 
 # Run the server
 if __name__ == "__main__":
-    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
+    if os.environ.get("PROD") == "1":
+        # Production: multiple workers on the uvloop/httptools stack,
+        # no file-watcher overhead from reload
+        uvicorn.run(
+            "server:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=os.cpu_count(),
+            loop="uvloop",
+            http="httptools",
+            log_level="warning",
+        )
+    else:
+        uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,44 @@
+"""Deterministic on-disk cache for exact-match prompt replays.
+
+Keys are sha256 hex digests of the canonical request payload; values are
+small JSON documents holding the fields needed to rebuild an AIMessage.
+Entries live under ``~/.cache/fastapi_chat/`` sharded by the first two
+hex characters of the key so no single directory grows unbounded.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+
+_CACHE_DIR = os.path.expanduser("~/.cache/fastapi_chat")
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    """Return the cached response dict for key, or None on a miss."""
+    try:
+        with open(_entry_path(key), "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def set(key: str, resp_dict: Dict[str, Any]) -> None:
+    """Store resp_dict under key; failures are silently ignored.
+
+    The write goes through a temp file + rename so concurrent runs never
+    observe a half-written entry.
+    """
+    path = _entry_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(resp_dict))
+        os.replace(tmp, path)
+    except OSError:
+        pass
@@ -0,0 +1,91 @@
+"""Optional semantic prompt cache backed by local sentence embeddings.
+
+Prompts are embedded with a small SentenceTransformer and compared by
+cosine similarity against the stored normalized matrix; a hit requires
+similarity >= threshold and a matching model name. Embeddings persist
+in a single ``.npz`` next to a JSON sidecar holding prompts, model
+names, and response dicts, alongside the exact cache's entries.
+
+sentence-transformers is an optional dependency: when it is not
+installed, lookups miss and stores are no-ops, so callers need no
+feature check.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+
+_CACHE_DIR = os.path.expanduser("~/.cache/fastapi_chat")
+_EMBEDDINGS_PATH = os.path.join(_CACHE_DIR, "semantic.npz")
+_ENTRIES_PATH = os.path.join(_CACHE_DIR, "semantic.json")
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = 0.92):
+        self.threshold = threshold
+        self._model = None
+        self._embeddings = None
+        self._entries = []
+        self._loaded = False
+
+    def _encoder(self):
+        """Lazily load the embedding model; None when unavailable."""
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                return None
+            self._model = SentenceTransformer("all-MiniLM-L6-v2")
+        return self._model
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        import numpy as np
+
+        try:
+            with open(_ENTRIES_PATH, "rb") as f:
+                self._entries = orjson.loads(f.read())
+            self._embeddings = np.load(_EMBEDDINGS_PATH)["embeddings"]
+        except (OSError, KeyError, orjson.JSONDecodeError):
+            self._entries = []
+            self._embeddings = None
+
+    def lookup(self, model: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """Return the response dict of the closest paraphrase, or None."""
+        encoder = self._encoder()
+        if encoder is None:
+            return None
+        self._load()
+        if self._embeddings is None or not self._entries:
+            return None
+        e = encoder.encode(prompt, normalize_embeddings=True)
+        sims = self._embeddings @ e
+        best = int(sims.argmax())
+        if sims[best] >= self.threshold and self._entries[best]["model"] == model:
+            return self._entries[best]["response"]
+        return None
+
+    def store(self, model: str, prompt: str, response: Dict[str, Any]) -> None:
+        """Append an entry and persist; failures are silently ignored."""
+        encoder = self._encoder()
+        if encoder is None:
+            return
+        self._load()
+        import numpy as np
+
+        e = encoder.encode(prompt, normalize_embeddings=True).astype(np.float32)
+        if self._embeddings is None:
+            self._embeddings = e[None, :]
+        else:
+            self._embeddings = np.vstack([self._embeddings, e])
+        self._entries.append({"prompt": prompt, "model": model, "response": response})
+        try:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            np.savez(_EMBEDDINGS_PATH, embeddings=self._embeddings)
+            with open(_ENTRIES_PATH, "wb") as f:
+                f.write(orjson.dumps(self._entries))
+        except OSError:
+            pass
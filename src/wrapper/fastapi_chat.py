@@ -1,7 +1,14 @@
-import requests
-import json
-from typing import List, Dict, Any, Optional, Union
-from pydantic import BaseModel
+import asyncio
+import atexit
+import hashlib
+import os
+import socket
+
+import cachetools
+import httpx
+import orjson
+from typing import ClassVar, Dict, List, Any, Optional, Union
+from pydantic import BaseModel, ConfigDict
 import logging
 
 # Set up logging
@@ -10,6 +17,9 @@ logger = logging.getLogger(__name__)
 
 
 class Message(BaseModel):
+    # Plain data carriers: drop unknown fields instead of tracking them
+    model_config = ConfigDict(extra="ignore")
+
     role: str
     content: str
 
@@ -40,98 +50,338 @@ class TokenUsage(BaseModel):
     total_tokens: int
 
 
+# Hoisted include-set for the wire format of a message
+_API_MESSAGE_FIELDS = {"role", "content"}
+
+# Disable Nagle for the small-JSON round-trips and keep idle pooled
+# sockets alive at the TCP level
+_SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+
+_POOL_LIMITS = httpx.Limits(
+    max_keepalive_connections=20,
+    max_connections=100,
+    keepalive_expiry=30.0,
+)
+
+
+# On-disk cache of server-side model config IDs so repeated CLI runs can
+# skip the /v1/models/create round-trip
+_MODEL_ID_CACHE_PATH = os.path.expanduser("~/.cache/langchain_testbed.json")
+
+
+def _load_model_id_cache() -> Dict[str, str]:
+    try:
+        with open(_MODEL_ID_CACHE_PATH, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+
+
+def _store_model_id_cache(cache: Dict[str, str]):
+    try:
+        os.makedirs(os.path.dirname(_MODEL_ID_CACHE_PATH), exist_ok=True)
+        with open(_MODEL_ID_CACHE_PATH, "wb") as f:
+            f.write(orjson.dumps(cache))
+    except OSError:
+        pass
+
+
 class FastAPIChatOpenAI:
     """
     A class that mimics the LangChain OpenAI chat completion class.
     It communicates with the FastAPI server to get completions.
     """
 
+    # Shared per base_url so every instance talking to the same server
+    # draws from one HTTP/2 keep-alive connection pool
+    _clients: ClassVar[Dict[str, httpx.Client]] = {}
+
+    @classmethod
+    def _get_client(cls, base_url: str) -> httpx.Client:
+        """Lazily build the HTTP/2 client shared by instances with this base_url."""
+        client = cls._clients.get(base_url)
+        if client is None:
+            client = httpx.Client(
+                base_url=base_url,
+                headers={"Content-Type": "application/json"},
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                transport=httpx.HTTPTransport(
+                    http2=True,
+                    limits=_POOL_LIMITS,
+                    socket_options=_SOCKET_OPTIONS,
+                ),
+            )
+            atexit.register(client.close)
+            cls._clients[base_url] = client
+        return client
+
     def __init__(
         self,
         base_url: str = "http://localhost:8000",
         model: str = "gpt-3.5-turbo",
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        cache_enabled: bool = True,
     ):
         self.base_url = base_url
         self.model_name = model
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.headers = {"Content-Type": "application/json"}
+        self.cache_enabled = cache_enabled
+        # Raw response bytes for stateless prompts, keyed by payload hash;
+        # stateful turns (with a conversation_id) always bypass this
+        self._response_cache = cachetools.LRUCache(maxsize=256)
         self.conversation_id = None  # Track conversation ID for stateful chat
+        self.model_id = None  # Server-side model configuration, set by create_model
+        # Wire-format dicts for already-seen message objects, keyed by id();
+        # the object reference in each entry guards against id reuse
+        self._converted_cache: Dict[int, tuple] = {}
+
+        self.client = self._get_client(self.base_url)
 
-        # Check health of the API server
-        self._check_health()
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # The client is shared and closed at interpreter exit, so leaving
+        # the context manager does not tear it down
+        pass
 
     def _check_health(self) -> Dict[str, Any]:
         """Check if the API server is healthy."""
         try:
-            health_response = requests.get(f"{self.base_url}/health")
+            health_response = self.client.get("/health")
             health_response.raise_for_status()
-            return health_response.json()
-        except requests.exceptions.RequestException as e:
+            return orjson.loads(health_response.content)
+        except httpx.HTTPError as e:
             print(f"Warning: API server health check failed: {e}")
             return {"status": "unhealthy", "error": str(e)}
 
     def _convert_messages_to_api_format(self, messages: List[Message]) -> List[Dict[str, str]]:
-        """Convert LangChain style messages to API format."""
-        return [{"role": msg.role, "content": msg.content} for msg in messages]
-
-    def invoke(self, messages: List[Union[SystemMessage, HumanMessage, AIMessage]]) -> AIMessage:
-        """
-        Invoke the chat model to get a completion.
-
-        Args:
-            messages: List of LangChain style messages
+        """Convert LangChain style messages to API format, reusing prior conversions."""
+        if len(self._converted_cache) > 1024:
+            self._converted_cache.clear()
+        converted = []
+        for msg in messages:
+            entry = self._converted_cache.get(id(msg))
+            if entry is None or entry[0] is not msg:
+                entry = (msg, msg.model_dump(include=_API_MESSAGE_FIELDS))
+                self._converted_cache[id(msg)] = entry
+            converted.append(entry[1])
+        return converted
+
+    def _build_payload(
+        self,
+        messages: List[Union[SystemMessage, HumanMessage, AIMessage]],
+        stateless: bool = False,
+    ) -> Dict[str, Any]:
+        """Build the chat completion request payload.
 
-        Returns:
-            AIMessage: The response from the model
+        With stateless=True any adopted conversation_id is ignored, so the
+        request carries the full message list and opens no stateful turn.
         """
-        logger.info(f"Wrapper chat model with messages: {messages}")
-        chat_url = f"{self.base_url}/v1/chat/completions"
+        if self.conversation_id and not stateless:
+            # The server replays prior turns from Redis, so only the
+            # messages after the last assistant reply need to go on the wire
+            for i in range(len(messages) - 1, -1, -1):
+                if isinstance(messages[i], AIMessage):
+                    messages = messages[i + 1:]
+                    break
 
         payload = {
             "messages": self._convert_messages_to_api_format(messages),
-            "model": self.model_name,
-            "temperature": self.temperature,
         }
 
-        if self.max_tokens:
-            payload["max_tokens"] = self.max_tokens
+        if self.model_id:
+            # The server resolves parameters from the stored configuration
+            payload["model_id"] = self.model_id
+        else:
+            payload["model"] = self.model_name
+            payload["temperature"] = self.temperature
+            if self.max_tokens:
+                payload["max_tokens"] = self.max_tokens
 
         # Add conversation_id if we have one to maintain state
-        if self.conversation_id:
+        if self.conversation_id and not stateless:
             payload["conversation_id"] = self.conversation_id
 
+        # A stable system prefix keys OpenAI's server-side prompt cache;
+        # derive it from the system message, never the user prompt
+        for msg in messages:
+            if isinstance(msg, SystemMessage):
+                payload["prompt_cache_key"] = hashlib.sha256(
+                    msg.content.encode()
+                ).hexdigest()[:32]
+                break
+
+        return payload
+
+    def _build_ai_message(
+        self, result: Dict[str, Any], adopt_conversation: bool = True
+    ) -> AIMessage:
+        """Build an AIMessage from a decoded chat completion response.
+
+        Stateless callers pass adopt_conversation=False so a response never
+        mutates shared instance state (concurrent batch requests would
+        otherwise adopt whichever conversation_id landed first).
+        """
+        # Store the conversation_id for future interactions
+        if adopt_conversation and "conversation_id" in result:
+            self.conversation_id = result["conversation_id"]
+
+        usage = result.get("usage")
+
+        # The server response is trusted, so skip Pydantic validation
+        return AIMessage.model_construct(
+            content=result["content"],
+            response_metadata={"token_usage": usage} if usage else None,
+            additional_kwargs=result.get("additional_kwargs", {}),
+        )
+
+    def _model_cache_key(self) -> str:
+        return f"{self.model_name}|{self.temperature}|{self.max_tokens}"
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """
+        List model configurations stored on the server.
+
+        Returns:
+            List of {"model_id", "config"} entries
+        """
         try:
-            response = requests.post(chat_url, headers=self.headers, data=json.dumps(payload))
+            response = self.client.get("/v1/models")
             response.raise_for_status()
+            return orjson.loads(response.content)
+        except httpx.HTTPError as e:
+            print(f"Error listing models: {e}")
+            return []
 
-            result = response.json()
+    def create_model(self) -> Optional[str]:
+        """
+        Store this configuration server-side and use its model_id for chats.
 
-            # Store the conversation_id for future interactions
-            if "conversation_id" in result:
-                self.conversation_id = result["conversation_id"]
+        The ID is cached on disk keyed by (model, temperature, max_tokens),
+        and later runs reuse it after confirming the server still has the
+        configuration — skipping the create round-trip entirely.
 
-            # Create an AIMessage from the response
-            ai_message = AIMessage(content=result["content"])
+        Returns:
+            The model_id, or None if the server request failed
+        """
+        cache = _load_model_id_cache()
+        cached_id = cache.get(self._model_cache_key())
+        if cached_id and any(m.get("model_id") == cached_id for m in self.list_models()):
+            self.model_id = cached_id
+            return cached_id
 
-            # Add token usage if available
-            if "usage" in result and result["usage"]:
-                ai_message.response_metadata = {"token_usage": result["usage"]}
+        payload = {"model": self.model_name, "temperature": self.temperature}
+        if self.max_tokens:
+            payload["max_tokens"] = self.max_tokens
+        try:
+            response = self.client.post("/v1/models/create", content=orjson.dumps(payload))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Error creating model configuration: {e}")
+            return None
 
-            # Add any additional kwargs
-            ai_message.additional_kwargs = result.get("additional_kwargs", {})
+        self.model_id = orjson.loads(response.content)["model_id"]
+        cache[self._model_cache_key()] = self.model_id
+        _store_model_id_cache(cache)
+        return self.model_id
 
-            return ai_message
+    def invoke(
+        self,
+        messages: List[Union[SystemMessage, HumanMessage, AIMessage]],
+        stateless: bool = False,
+    ) -> AIMessage:
+        """
+        Invoke the chat model to get a completion.
+
+        Args:
+            messages: List of LangChain style messages
+            stateless: When True the request ignores any adopted
+                conversation_id and the response never stores one, so
+                repeated one-shot prompts on a long-lived instance stay
+                independent (and cacheable)
 
-        except requests.exceptions.RequestException as e:
+        Returns:
+            AIMessage: The response from the model
+        """
+        logger.info(f"Wrapper chat model with messages: {messages}")
+
+        payload = self._build_payload(messages, stateless=stateless)
+        body = orjson.dumps(payload)
+
+        # Identical stateless prompts are answered from the local cache
+        # without touching the network
+        cache_key = None
+        if self.cache_enabled and (stateless or not self.conversation_id):
+            cache_key = hashlib.blake2b(body).digest()
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                return self._build_ai_message(
+                    orjson.loads(cached), adopt_conversation=not stateless
+                )
+
+        try:
+            response = self.client.post("/v1/chat/completions", content=body)
+
+            # Fast path: one status compare, then decode straight from the
+            # response bytes — no header scan or exception machinery
+            if response.status_code == 200:
+                if cache_key is not None:
+                    self._response_cache[cache_key] = response.content
+                return self._build_ai_message(
+                    orjson.loads(response.content), adopt_conversation=not stateless
+                )
+
+            response.raise_for_status()
+            return self._build_ai_message(
+                orjson.loads(response.content), adopt_conversation=not stateless
+            )
+
+        except httpx.HTTPError as e:
+            if isinstance(e, httpx.ConnectError):
+                # Diagnose the server only once a request actually fails
+                self._check_health()
             print(f"Error making request: {e}")
-            if hasattr(e, "response") and e.response:
+            if hasattr(e, "response") and e.response is not None:
                 print(f"Response status code: {e.response.status_code}")
                 print(f"Response body: {e.response.text}")
             raise e
 
+    def stream(self, messages: List[Union[SystemMessage, HumanMessage, AIMessage]]):
+        """
+        Stream a completion from the chat model token by token.
+
+        Args:
+            messages: List of LangChain style messages
+
+        Yields:
+            str: Content chunks as they arrive from the server
+
+        The final server event carries the conversation ID, which is stored
+        for subsequent stateful calls just like invoke().
+        """
+        payload = self._build_payload(messages)
+
+        with self.client.stream(
+            "POST", "/v1/chat/completions/stream", content=orjson.dumps(payload)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = orjson.loads(line[6:])
+                if "error" in event:
+                    raise RuntimeError(f"Server error during stream: {event['error']}")
+                if event.get("done"):
+                    self.conversation_id = event.get("conversation_id", self.conversation_id)
+                elif event.get("content"):
+                    yield event["content"]
+
     ###
     # TODO: need to decide if the conversation related methods are needed
     ###
@@ -147,11 +397,10 @@ class FastAPIChatOpenAI:
             return {"error": "No active conversation"}
 
         try:
-            url = f"{self.base_url}/v1/conversations/{self.conversation_id}"
-            response = requests.get(url)
+            response = self.client.get(f"/v1/conversations/{self.conversation_id}")
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return orjson.loads(response.content)
+        except httpx.HTTPError as e:
             print(f"Error retrieving conversation: {e}")
             return {"error": str(e)}
 
@@ -163,11 +412,10 @@ class FastAPIChatOpenAI:
             List of conversation IDs
         """
         try:
-            url = f"{self.base_url}/v1/conversations"
-            response = requests.get(url)
+            response = self.client.get("/v1/conversations")
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return orjson.loads(response.content)
+        except httpx.HTTPError as e:
             print(f"Error listing conversations: {e}")
             return []
 
@@ -186,15 +434,193 @@ class FastAPIChatOpenAI:
             return {"error": "No conversation ID provided"}
 
         try:
-            url = f"{self.base_url}/v1/conversations/{conv_id}"
-            response = requests.delete(url)
+            response = self.client.delete(f"/v1/conversations/{conv_id}")
             response.raise_for_status()
 
             # Reset conversation_id if we deleted the current conversation
             if conv_id == self.conversation_id:
                 self.conversation_id = None
 
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return orjson.loads(response.content)
+        except httpx.HTTPError as e:
             print(f"Error deleting conversation: {e}")
             return {"error": str(e)}
+
+
+class AsyncFastAPIChatOpenAI(FastAPIChatOpenAI):
+    """
+    Async variant of FastAPIChatOpenAI for callers that want to issue
+    multiple completions concurrently over one multiplexed connection.
+    """
+
+    # Shared per base_url, mirroring the sync client pool
+    _async_clients: ClassVar[Dict[str, httpx.AsyncClient]] = {}
+
+    @classmethod
+    def _get_async_client(cls, base_url: str) -> httpx.AsyncClient:
+        """Lazily build the async HTTP/2 client shared by instances with this base_url."""
+        client = cls._async_clients.get(base_url)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=base_url,
+                headers={"Content-Type": "application/json"},
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                transport=httpx.AsyncHTTPTransport(
+                    http2=True,
+                    limits=_POOL_LIMITS,
+                    socket_options=_SOCKET_OPTIONS,
+                ),
+            )
+            cls._async_clients[base_url] = client
+        return client
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        model: str = "gpt-3.5-turbo",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+    ):
+        super().__init__(
+            base_url=base_url, model=model, temperature=temperature, max_tokens=max_tokens
+        )
+        self.aclient = self._get_async_client(self.base_url)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+    async def aclose(self):
+        """Close the shared async client for this base_url."""
+        client = self._async_clients.pop(self.base_url, None)
+        if client is not None:
+            await client.aclose()
+
+    async def ainvoke(
+        self,
+        messages: List[Union[SystemMessage, HumanMessage, AIMessage]],
+        stateless: bool = False,
+    ) -> AIMessage:
+        """
+        Invoke the chat model asynchronously to get a completion.
+
+        Args:
+            messages: List of LangChain style messages
+            stateless: When True the request ignores any adopted
+                conversation_id and the response never stores one, so
+                concurrent calls on a shared instance stay independent
+
+        Returns:
+            AIMessage: The response from the model
+        """
+        logger.info(f"Wrapper chat model with messages: {messages}")
+
+        payload = self._build_payload(messages, stateless=stateless)
+
+        try:
+            response = await self.aclient.post(
+                "/v1/chat/completions", content=orjson.dumps(payload)
+            )
+
+            # Same status fast path as the sync client
+            if response.status_code == 200:
+                return self._build_ai_message(
+                    orjson.loads(response.content), adopt_conversation=not stateless
+                )
+
+            response.raise_for_status()
+            return self._build_ai_message(
+                orjson.loads(response.content), adopt_conversation=not stateless
+            )
+
+        except httpx.HTTPError as e:
+            print(f"Error making request: {e}")
+            if hasattr(e, "response") and e.response is not None:
+                print(f"Response status code: {e.response.status_code}")
+                print(f"Response body: {e.response.text}")
+            raise e
+
+    async def abatch(
+        self,
+        batches: List[List[Union[SystemMessage, HumanMessage, AIMessage]]],
+        max_concurrency: int = 20,
+    ) -> List[Union[AIMessage, Exception]]:
+        """
+        Invoke the chat model concurrently for several message lists.
+
+        Args:
+            batches: One message list per completion to request
+            max_concurrency: Cap on simultaneous in-flight requests
+
+        Returns:
+            Results in input order; failed requests yield their exception
+            instead of an AIMessage.
+
+        Batches are treated as independent stateless prompts; for stateful
+        turns use ainvoke sequentially so history ordering is preserved.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def one(messages):
+            async with semaphore:
+                return await self.ainvoke(messages, stateless=True)
+
+        return await asyncio.gather(*(one(messages) for messages in batches),
+                                    return_exceptions=True)
+
+    def batch(
+        self,
+        batches: List[List[Union[SystemMessage, HumanMessage, AIMessage]]],
+        max_concurrency: int = 20,
+    ) -> List[Union[AIMessage, Exception]]:
+        """Synchronous convenience wrapper around abatch for test harnesses."""
+        return asyncio.run(self.abatch(batches, max_concurrency=max_concurrency))
+
+    async def astream(self, messages: List[Union[SystemMessage, HumanMessage, AIMessage]]):
+        """
+        Stream a completion asynchronously, yielding content chunks.
+
+        Mirrors stream() on the sync class: chunks arrive as server-sent
+        events, and the final event's conversation ID is stored for
+        stateful follow-ups. Network receive overlaps caller processing,
+        so first output appears at first-token latency.
+        """
+        payload = self._build_payload(messages)
+
+        async with self.aclient.stream(
+            "POST", "/v1/chat/completions/stream", content=orjson.dumps(payload)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = orjson.loads(line[6:])
+                if "error" in event:
+                    raise RuntimeError(f"Server error during stream: {event['error']}")
+                if event.get("done"):
+                    self.conversation_id = event.get("conversation_id", self.conversation_id)
+                elif event.get("content"):
+                    yield event["content"]
+
+    async def alist_all(self) -> Dict[str, Any]:
+        """
+        Fetch conversation IDs and model configurations concurrently.
+
+        Returns:
+            {"conversations": [...], "models": [...]}
+
+        The two GETs fan out with asyncio.gather, so the pair costs one
+        round-trip instead of two sequential ones.
+        """
+        conversations, models = await asyncio.gather(
+            self.aclient.get("/v1/conversations"),
+            self.aclient.get("/v1/models"),
+        )
+        conversations.raise_for_status()
+        models.raise_for_status()
+        return {
+            "conversations": orjson.loads(conversations.content),
+            "models": orjson.loads(models.content),
+        }
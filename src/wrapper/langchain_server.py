@@ -1,14 +1,21 @@
 import os
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, Depends
-from pydantic import BaseModel, Field
 
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
+import httpx
+import openai
+from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 
+import asyncio
+import hashlib
 import uuid
-import json
+import msgpack
+import orjson
 import redis
+import zstandard as zstd
+from redis import asyncio as aioredis
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
@@ -29,43 +36,48 @@ class RedisConfig(BaseModel):
         int(os.environ.get("CONVERSATION_TTL", 3600)),
         description="Conversation time to live in seconds",
     )
+    model_ttl: int = Field(
+        int(os.environ.get("MODEL_TTL", 86400)),
+        description="Model configuration time to live in seconds",
+    )
 
 
 # Global Redis configuration
 redis_config = RedisConfig()
 
 
+# Shared connection pools built once at startup; clients handed out per
+# request reuse these sockets instead of reconnecting and pinging
+REDIS_POOL = aioredis.ConnectionPool(
+    host=redis_config.host,
+    port=redis_config.port,
+    db=redis_config.db,
+    password=redis_config.password,
+    decode_responses=True,
+    max_connections=64,
+    socket_keepalive=True,
+    health_check_interval=30,
+)
+
+REDIS_BINARY_POOL = aioredis.ConnectionPool(
+    host=redis_config.host,
+    port=redis_config.port,
+    db=redis_config.db,
+    password=redis_config.password,
+    max_connections=64,
+    socket_keepalive=True,
+    health_check_interval=30,
+)
+
+
 def get_redis_client():
-    """Get Redis client instance"""
-    try:
-        client = redis.Redis(
-            host=redis_config.host,
-            port=redis_config.port,
-            db=redis_config.db,
-            password=redis_config.password,
-            decode_responses=True,
-        )
-        # Test connection
-        client.ping()
-        return client
-    except redis.ConnectionError as e:
-        raise HTTPException(status_code=500, detail=f"Redis connection error: {str(e)}")
+    """Get an async Redis client backed by the shared connection pool"""
+    return aioredis.Redis(connection_pool=REDIS_POOL)
 
 
 def get_binary_redis_client():
-    """Get Redis client instance without decode_responses for binary data (like model storage)"""
-    try:
-        client = redis.Redis(
-            host=redis_config.host,
-            port=redis_config.port,
-            db=redis_config.db,
-            password=redis_config.password,
-        )
-        # Test connection
-        client.ping()
-        return client
-    except redis.ConnectionError as e:
-        raise HTTPException(status_code=500, detail=f"Redis connection error: {str(e)}")
+    """Get an async Redis client for binary data (like model storage) backed by the shared pool"""
+    return aioredis.Redis(connection_pool=REDIS_BINARY_POOL)
 
 
 app = FastAPI(
@@ -73,15 +85,22 @@ app = FastAPI(
     description="A FastAPI server that wraps the LangChain OpenAI chat completion API"
     " with Redis state management",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 
 class Message(BaseModel):
+    # Ignore unknown fields instead of tracking them; clients sometimes
+    # send extra OpenAI-style keys we never read
+    model_config = ConfigDict(extra="ignore")
+
     role: str = Field(..., description="The role of the message sender (system, user, assistant)")
     content: str = Field(..., description="The content of the message")
 
 
 class ChatCompletionRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     messages: List[Message] = Field(..., description="List of messages in the conversation")
     model: str = Field("gpt-3.5-turbo", description="The OpenAI model to use")
     temperature: float = Field(0.7, description="Controls randomness of the output")
@@ -89,202 +108,568 @@ class ChatCompletionRequest(BaseModel):
     conversation_id: Optional[str] = Field(
         None, description="Conversation ID for continuing a conversation"
     )
-
-
-class TokenUsage(BaseModel):
-    prompt_tokens: int
-    completion_tokens: int
-    total_tokens: int
-
-
-class ChatCompletionResponse(BaseModel):
-    content: str = Field(..., description="The generated text from the model")
-    conversation_id: str = Field(..., description="The conversation ID for future reference")
-    usage: Optional[TokenUsage] = Field(None, description="Token usage information")
-    additional_kwargs: Dict[str, Any] = Field({}, description="Additional metadata")
+    model_id: Optional[str] = Field(
+        None, description="ID of a stored model configuration to use instead of inline parameters"
+    )
+    prompt_cache_key: Optional[str] = Field(
+        None, description="Stable key forwarded to OpenAI's server-side prompt cache"
+    )
 
 
 class ConversationResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     conversation_id: str
     messages: List[Dict[str, str]]
     created_at: Optional[str] = None
     expires_at: Optional[str] = None
 
 
+class ModelConfigRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    model: str = Field("gpt-3.5-turbo", description="The OpenAI model to use")
+    temperature: float = Field(0.7, description="Controls randomness of the output")
+    max_tokens: Optional[int] = Field(None, description="Maximum number of tokens to generate")
+
+
+# LangChain pulls in tiktoken, httpx setup, and pydantic compat layers
+# (~500ms); defer it so cold start and --reload restarts stay fast and
+# Redis-only endpoints never pay for it
+@lru_cache(maxsize=1)
+def _message_dispatch():
+    """Build the role<->class dispatch tables on first use."""
+    from langchain.schema import HumanMessage, SystemMessage, AIMessage
+
+    role_map = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+    return role_map, {cls: role for role, cls in role_map.items()}
+
+
+# Sliding-window cap on messages replayed to the LLM and retained per
+# conversation, so per-turn token cost stays O(1) instead of O(turns)
+CONV_WINDOW = int(os.environ.get("CONV_WINDOW", 12))
+
+
+# Resolved once at import so the per-request dependency does not hit the
+# environment on the hot path
+_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+
+@app.on_event("startup")
+async def check_openai_api_key():
+    """Refuse to start without an OpenAI API key rather than failing per request."""
+    if not _API_KEY:
+        raise RuntimeError("OPENAI_API_KEY environment variable not set")
+
+
 def get_openai_api_key():
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OPENAI_API_KEY environment variable not set")
-    return api_key
+    # The startup hook already refused to boot without a key, so the
+    # dependency is a bare constant return on the hot path
+    return _API_KEY
 
 
-def create_llm_instance(
+# Shared HTTP client so all cached ChatOpenAI instances reuse one
+# keep-alive connection pool to the OpenAI API
+_openai_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+)
+
+
+@lru_cache(maxsize=32)
+def _get_llm(
     model: str,
     temperature: float,
     max_tokens: Optional[int],
-) -> ChatOpenAI:
-    """Create and return a ChatOpenAI instance with the given parameters."""
+    api_key: str,
+):
+    """Create (or return a cached) ChatOpenAI instance for the given parameters."""
+    from langchain_openai import ChatOpenAI
+
     return ChatOpenAI(
         model=model,
         temperature=temperature,
         max_tokens=max_tokens,
+        api_key=api_key,
+        http_async_client=_openai_http_client,
     )
 
 
-@app.post("/v1/chat/completions", response_model=ChatCompletionResponse)
-async def chat_completion(
-    request: ChatCompletionRequest, api_key: str = Depends(get_openai_api_key)
-):
-    logger.info(f"\tReceived request: {request.json()}")
-    try:
-        # Initialize Redis client (only for conversation history)
-        redis_client = get_redis_client()
-
-        # Use configuration from the request
-        model = request.model
-        temperature = request.temperature
-        max_tokens = request.max_tokens
-
-        # Create the ChatOpenAI instance
-        llm = create_llm_instance(
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
+# Futures for stateless requests currently in flight, keyed by request
+# fingerprint, so concurrent duplicates share one upstream OpenAI call
+_INFLIGHT: Dict[bytes, asyncio.Future] = {}
+
+
+def _request_fingerprint(request: ChatCompletionRequest) -> bytes:
+    """Hash the parts of a request that determine its completion.
+
+    model_id must participate: when it is set the inline model fields are
+    just defaults, and the real parameters come from the stored config.
+    """
+    return hashlib.blake2b(
+        orjson.dumps(
+            [
+                request.model_id,
+                request.model,
+                request.temperature,
+                request.max_tokens,
+                [[msg.role, msg.content] for msg in request.messages],
+            ]
         )
+    ).digest()
+
+
+async def _deduped_invoke(llm, request: ChatCompletionRequest, langchain_messages):
+    """Invoke the LLM, sharing one upstream call among identical concurrent requests.
+
+    Stateful requests (with a conversation_id) are never deduplicated.
+    """
+    # Forward the client's prompt-cache key so OpenAI can reuse the
+    # prefill for requests sharing a stable prefix
+    kwargs = (
+        {"extra_body": {"prompt_cache_key": request.prompt_cache_key}}
+        if request.prompt_cache_key
+        else {}
+    )
+
+    if request.conversation_id:
+        return await llm.ainvoke(langchain_messages, **kwargs)
 
-        # Use provided conversation_id or generate a new one
-        conversation_id = request.conversation_id or str(uuid.uuid4())
-
-        # Initialize messages list
-        langchain_messages = []
-
-        # If conversation_id is provided and exists in Redis, retrieve the history
-        if request.conversation_id:
-            stored_messages = get_conversation(redis_client, conversation_id)
-            if stored_messages:
-                # Convert stored messages to LangChain format
-                langchain_messages = dict_to_langchain_messages(stored_messages)
-
-        # Add new messages from the request
-        for msg in request.messages:
-            if msg.role == "system":
-                langchain_messages.append(SystemMessage(content=msg.content))
-            elif msg.role == "user":
-                langchain_messages.append(HumanMessage(content=msg.content))
-            elif msg.role == "assistant":
-                langchain_messages.append(AIMessage(content=msg.content))
-
-        # Get the response
-        response = llm.invoke(langchain_messages)
-
-        # Add the assistant's response to the messages
-        langchain_messages.append(AIMessage(content=response.content))
-
-        # Save the updated conversation to Redis
-        save_conversation(
-            redis_client, conversation_id, langchain_to_dict_messages(langchain_messages)
+    fingerprint = _request_fingerprint(request)
+    existing = _INFLIGHT.get(fingerprint)
+    if existing is not None:
+        return await existing
+
+    future = asyncio.get_running_loop().create_future()
+    _INFLIGHT[fingerprint] = future
+    try:
+        response = await llm.ainvoke(langchain_messages, **kwargs)
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved in case no duplicate is waiting
+        raise
+    else:
+        future.set_result(response)
+        return response
+    finally:
+        _INFLIGHT.pop(fingerprint, None)
+
+
+async def _fetch_chat_state(request: ChatCompletionRequest, redis_client: aioredis.Redis):
+    """Resolve model parameters and stored history in one Redis round-trip.
+
+    The model-config GET and history LRANGE ride the same pipeline, so a
+    stateful request using a stored model pays one RTT instead of two.
+    Returns (model, temperature, max_tokens, stored_messages).
+    """
+    # Any provided conversation_id references stored history (IDs
+    # originate server-side), possibly written by another worker or
+    # before a restart — always replay it. First turns carry no ID, so
+    # the common stateless case still skips the round-trip
+    fetch_history = bool(request.conversation_id)
+
+    raw_config = history = None
+    if request.model_id or fetch_history:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                if request.model_id:
+                    pipe.get(get_model_key(request.model_id))
+                if fetch_history:
+                    pipe.lrange(get_conversation_key(request.conversation_id), 0, -1)
+                results = await pipe.execute()
+        except redis.RedisError as e:
+            raise HTTPException(status_code=500, detail=f"Redis error: {str(e)}")
+        if request.model_id:
+            raw_config = results[0]
+        if fetch_history:
+            history = results[-1]
+
+    if request.model_id:
+        if raw_config is None:
+            raise HTTPException(
+                status_code=404, detail=f"Model configuration {request.model_id} not found"
+            )
+        config = _decode_payload(raw_config)
+        model, temperature, max_tokens = (
+            config["model"],
+            config["temperature"],
+            config.get("max_tokens"),
         )
+    else:
+        model, temperature, max_tokens = request.model, request.temperature, request.max_tokens
 
-        # Extract token usage if available
-        token_usage = None
-        if hasattr(response, "response_metadata") and response.response_metadata:
-            if "token_usage" in response.response_metadata:
-                usage_data = response.response_metadata["token_usage"]
-                token_usage = TokenUsage(
-                    prompt_tokens=usage_data.get("prompt_tokens", 0),
-                    completion_tokens=usage_data.get("completion_tokens", 0),
-                    total_tokens=usage_data.get("total_tokens", 0),
-                )
-
-        # Construct the response
-        result = ChatCompletionResponse(
-            content=response.content,
-            conversation_id=conversation_id,
-            usage=token_usage,
-            additional_kwargs=response.additional_kwargs,
+    stored_messages = [_deserialize_msg(msg) for msg in history] if history else []
+    return model, temperature, max_tokens, stored_messages
+
+
+def _prepare_chat(request: ChatCompletionRequest, stored_messages: List[Dict[str, str]]):
+    """Resolve the conversation ID and assemble the full LangChain message list.
+
+    Returns (conversation_id, langchain_messages, new_messages) where
+    new_messages holds only this turn's inbound messages.
+    """
+    # Use provided conversation_id or generate a new one
+    # .hex skips the hyphenated str() formatting and yields shorter keys
+    conversation_id = request.conversation_id or uuid.uuid4().hex
+
+    role_map, _ = _message_dispatch()
+
+    # Convert any stored history to LangChain format
+    langchain_messages = dict_to_langchain_messages(stored_messages) if stored_messages else []
+
+    # Reject unknown roles up front instead of silently dropping them
+    if not {msg.role for msg in request.messages} <= role_map.keys():
+        raise HTTPException(
+            status_code=400,
+            detail="Message roles must be one of: system, user, assistant",
         )
 
-        return result
+    # Add new messages from the request
+    new_messages = [role_map[msg.role](content=msg.content) for msg in request.messages]
+    langchain_messages.extend(new_messages)
 
-    except Exception as e:
+    # Trim to the sliding window, keeping a leading system message so the
+    # model never loses its instructions
+    if len(langchain_messages) > CONV_WINDOW:
+        system_cls = role_map["system"]
+        head = langchain_messages[:1] if isinstance(langchain_messages[0], system_cls) else []
+        langchain_messages = head + langchain_messages[-CONV_WINDOW:]
+
+    return conversation_id, langchain_messages, new_messages
+
+
+@app.post("/v1/chat/completions")
+async def chat_completion(
+    request: ChatCompletionRequest,
+    api_key: str = Depends(get_openai_api_key),
+    redis_client: aioredis.Redis = Depends(get_binary_redis_client),
+):
+    # Gate on the log level so the full request is only serialized when
+    # debug logging is actually enabled
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("\tReceived request: %s", request.json())
+
+    # Resolve the model config and any stored history in one round-trip,
+    # then create (or reuse) the ChatOpenAI instance for the configuration
+    model, temperature, max_tokens, stored_messages = await _fetch_chat_state(
+        request, redis_client
+    )
+    llm = _get_llm(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        api_key=api_key,
+    )
+
+    conversation_id, langchain_messages, new_messages = _prepare_chat(request, stored_messages)
+
+    # Get the response without blocking the event loop; identical
+    # stateless requests in flight share one upstream call
+    try:
+        response = await _deduped_invoke(llm, request, langchain_messages)
+    except openai.OpenAIError as e:
         raise HTTPException(status_code=500, detail=f"Error invoking OpenAI API: {str(e)}")
 
+    # Add the assistant's response to the messages
+    new_messages.append(_message_dispatch()[0]["assistant"](content=response.content))
+
+    # Hand this turn's delta to the background writer; the response does
+    # not wait on the Redis round-trip
+    queue_save_conversation(conversation_id, langchain_to_dict_messages(new_messages))
+
+    # Extract token usage if available
+    token_usage = None
+    if hasattr(response, "response_metadata") and response.response_metadata:
+        if "token_usage" in response.response_metadata:
+            usage_data = response.response_metadata["token_usage"]
+            token_usage = {
+                "prompt_tokens": usage_data.get("prompt_tokens", 0),
+                "completion_tokens": usage_data.get("completion_tokens", 0),
+                "total_tokens": usage_data.get("total_tokens", 0),
+            }
+
+    # Build the response payload directly, skipping the Pydantic
+    # validation + jsonable_encoder pass on the response path
+    return ORJSONResponse(
+        content={
+            "content": response.content,
+            "conversation_id": conversation_id,
+            "usage": token_usage,
+            "additional_kwargs": response.additional_kwargs,
+        }
+    )
+
+
+@app.post("/v1/chat/completions/stream")
+async def chat_completion_stream(
+    request: ChatCompletionRequest,
+    api_key: str = Depends(get_openai_api_key),
+    redis_client: aioredis.Redis = Depends(get_binary_redis_client),
+):
+    """Stream a completion as server-sent events instead of buffering it.
+
+    Time-to-first-byte drops from full generation time to first-token
+    latency; the conversation is persisted once the stream finishes.
+    """
+    model, temperature, max_tokens, stored_messages = await _fetch_chat_state(
+        request, redis_client
+    )
+    llm = _get_llm(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        api_key=api_key,
+    )
+
+    conversation_id, langchain_messages, new_messages = _prepare_chat(request, stored_messages)
+
+    async def event_stream():
+        chunks = []
+        try:
+            async for chunk in llm.astream(langchain_messages):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    # JSON-encode each event so content newlines cannot
+                    # break the SSE framing
+                    yield b"data: " + orjson.dumps({"content": chunk.content}) + b"\n\n"
+        except openai.OpenAIError as e:
+            yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+            return
+
+        # Persist the full turn once, after the stream completes
+        new_messages.append(_message_dispatch()[0]["assistant"](content="".join(chunks)))
+        queue_save_conversation(conversation_id, langchain_to_dict_messages(new_messages))
+
+        yield b"data: " + orjson.dumps(
+            {"conversation_id": conversation_id, "done": True}
+        ) + b"\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "api": "LangChain OpenAI Wrapper"}
 
 
+# Secondary indexes of known IDs, so listing is one O(entities) SMEMBERS
+# instead of a SCAN across the whole keyspace
+_CONVERSATIONS_INDEX = "conversations:index"
+_MODELS_INDEX = "models:index"
+
+# HASH of conversation_id -> last-seen timestamp; the eviction task uses
+# it to clear index/metadata entries whose lists have idled out
+_CONVERSATIONS_META = "conversations:meta"
+_EVICTION_INTERVAL = 60
+
+
 # Redis conversation utilities
 def get_conversation_key(conversation_id: str) -> str:
     """Generate a Redis key for storing conversation history"""
     return f"conversation:{conversation_id}"
 
 
-def save_conversation(client: redis.Redis, conversation_id: str, messages: List[Dict[str, str]]):
-    """Save conversation history to Redis"""
-    key = get_conversation_key(conversation_id)
-    client.set(key, json.dumps(messages))
-    client.expire(key, redis_config.conversation_ttl)
-
-
-def get_conversation(client: redis.Redis, conversation_id: str) -> List[Dict[str, str]]:
-    """Retrieve conversation history from Redis"""
-    key = get_conversation_key(conversation_id)
-    data = client.get(key)
-    if data:
-        return json.loads(data)
-    return []
+# Wire format for values stored in Redis: msgpack is smaller and cheaper
+# to parse, json keeps values readable in redis-cli for debugging
+_SERIALIZER = os.environ.get("SERIALIZER", "json")
+
+
+def _encode_payload(value) -> bytes:
+    """Encode a value for Redis storage using the configured serializer"""
+    if _SERIALIZER == "msgpack":
+        return msgpack.packb(value, use_bin_type=True)
+    return orjson.dumps(value)
+
+
+def _decode_payload(data: bytes):
+    """Decode a stored value regardless of which serializer wrote it.
+
+    JSON starts with '{' or '[' while msgpack maps/arrays do not, so
+    flipping SERIALIZER never strands previously written entries.
+    """
+    if data[:1] in (b"{", b"["):
+        return orjson.loads(data)
+    return msgpack.unpackb(data, raw=False)
+
+
+# Messages below this size gain little from compression and would pay
+# the frame overhead; larger ones typically shrink 5-10x
+_ZSTD_MIN_SIZE = 256
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_ZSTD_COMPRESSOR = zstd.ZstdCompressor(level=3)
+_ZSTD_DECOMPRESSOR = zstd.ZstdDecompressor()
+
+
+@lru_cache(maxsize=4096)
+def _serialize_msg(role: str, content: str) -> bytes:
+    """Encode a message once; repeats of the same (role, content) reuse the bytes"""
+    payload = _encode_payload({"role": role, "content": content})
+    if len(payload) >= _ZSTD_MIN_SIZE:
+        payload = _ZSTD_COMPRESSOR.compress(payload)
+    return payload
+
+
+def _deserialize_msg(data: bytes) -> Dict[str, str]:
+    """Decode a stored message, transparently decompressing zstd entries"""
+    if data[:4] == _ZSTD_MAGIC:
+        data = _ZSTD_DECOMPRESSOR.decompress(data)
+    return _decode_payload(data)
+
+
+# Queued conversation writes drained by a background task. Handlers
+# return without waiting on the Redis round-trip; a crash loses at most
+# one in-flight batch, an accepted trade for chat history
+_WRITE_QUEUE: asyncio.Queue = asyncio.Queue()
+_WRITE_BATCH_MAX = 64
+_WRITE_FLUSH_INTERVAL = 0.005
+
+
+def queue_save_conversation(conversation_id: str, new_messages: List[Dict[str, str]]):
+    """Queue this turn's messages for the background writer"""
+    if not new_messages:
+        return
+    _WRITE_QUEUE.put_nowait((conversation_id, new_messages))
+
+
+async def _drain_writes():
+    """Flush queued conversation writes in pipelined batches"""
+    client = get_binary_redis_client()
+    while True:
+        batch = [await _WRITE_QUEUE.get()]
+        # Give near-simultaneous writes a short window to coalesce into
+        # one pipeline
+        await asyncio.sleep(_WRITE_FLUSH_INTERVAL)
+        while len(batch) < _WRITE_BATCH_MAX:
+            try:
+                batch.append(_WRITE_QUEUE.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            # The history lives in a Redis LIST, so a turn costs one RPUSH
+            # of the delta instead of rewriting the whole serialized history
+            now = datetime.now().timestamp()
+            async with client.pipeline(transaction=False) as pipe:
+                for conversation_id, new_messages in batch:
+                    key = get_conversation_key(conversation_id)
+                    pipe.rpush(
+                        key,
+                        *(_serialize_msg(msg["role"], msg["content"]) for msg in new_messages),
+                    )
+                    # Bound stored history to the replay window so the list
+                    # cannot grow without limit
+                    pipe.ltrim(key, -CONV_WINDOW, -1)
+                    pipe.expire(key, redis_config.conversation_ttl)
+                    pipe.sadd(_CONVERSATIONS_INDEX, conversation_id)
+                    pipe.hset(_CONVERSATIONS_META, conversation_id, now)
+                await pipe.execute()
+        except redis.RedisError:
+            logger.exception("Failed to flush %d conversation write(s)", len(batch))
+        finally:
+            for _ in batch:
+                _WRITE_QUEUE.task_done()
+
+
+async def _evict_stale_conversations():
+    """Periodically clear bookkeeping for conversations idle past their TTL.
+
+    Redis expires the history lists on its own; this pass removes the
+    index and metadata entries left behind so listings stay accurate and
+    the HASH stays bounded.
+    """
+    client = get_binary_redis_client()
+    while True:
+        await asyncio.sleep(_EVICTION_INTERVAL)
+        try:
+            meta = await client.hgetall(_CONVERSATIONS_META)
+            cutoff = datetime.now().timestamp() - redis_config.conversation_ttl
+            stale = [
+                cid.decode() for cid, ts in meta.items() if float(ts.decode()) < cutoff
+            ]
+            if not stale:
+                continue
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.unlink(*(get_conversation_key(cid) for cid in stale))
+                pipe.hdel(_CONVERSATIONS_META, *stale)
+                pipe.srem(_CONVERSATIONS_INDEX, *stale)
+                await pipe.execute()
+            logger.info("Evicted %d stale conversation(s)", len(stale))
+        except redis.RedisError:
+            logger.exception("Conversation eviction pass failed")
+
+
+@app.on_event("startup")
+async def start_write_drainer():
+    """Start the background tasks for queued writes and stale-conversation eviction."""
+    app.state.write_drainer = asyncio.create_task(_drain_writes())
+    app.state.conversation_evictor = asyncio.create_task(_evict_stale_conversations())
+
+
+# Redis model configuration utilities
+def get_model_key(model_id: str) -> str:
+    """Generate a Redis key for storing a model configuration"""
+    return f"model:{model_id}"
+
+
+async def save_model_config(client: aioredis.Redis, model_id: str, config: Dict[str, Any]):
+    """Store a model configuration in Redis"""
+    # SET with ex= applies the TTL in the same command, avoiding a
+    # separate EXPIRE round-trip; the index SADD rides the same pipeline
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.set(get_model_key(model_id), _encode_payload(config), ex=redis_config.model_ttl)
+        pipe.sadd(_MODELS_INDEX, model_id)
+        await pipe.execute()
 
 
 def langchain_to_dict_messages(messages) -> List[Dict[str, str]]:
     """Convert LangChain message objects to dictionaries for storage"""
-    result = []
-    for msg in messages:
-        if isinstance(msg, SystemMessage):
-            result.append({"role": "system", "content": msg.content})
-        elif isinstance(msg, HumanMessage):
-            result.append({"role": "user", "content": msg.content})
-        elif isinstance(msg, AIMessage):
-            result.append({"role": "assistant", "content": msg.content})
-    return result
+    _, class_to_role = _message_dispatch()
+    return [
+        {"role": class_to_role[type(msg)], "content": msg.content}
+        for msg in messages
+        if type(msg) in class_to_role
+    ]
 
 
 def dict_to_langchain_messages(messages):
     """Convert dictionary messages to LangChain message objects"""
-    result = []
-    for msg in messages:
-        if msg["role"] == "system":
-            result.append(SystemMessage(content=msg["content"]))
-        elif msg["role"] == "user":
-            result.append(HumanMessage(content=msg["content"]))
-        elif msg["role"] == "assistant":
-            result.append(AIMessage(content=msg["content"]))
-    return result
-
-
-@app.get("/v1/conversations/{conversation_id}", response_model=ConversationResponse)
+    role_map, _ = _message_dispatch()
+    return [
+        role_map[msg["role"]](content=msg["content"])
+        for msg in messages
+        if msg["role"] in role_map
+    ]
+
+
+@app.get("/v1/conversations/{conversation_id}")
 async def get_conversation_history(
-    conversation_id: str, api_key: str = Depends(get_openai_api_key)
+    conversation_id: str,
+    api_key: str = Depends(get_openai_api_key),
+    redis_client: aioredis.Redis = Depends(get_binary_redis_client),
 ):
     """Retrieve a specific conversation history"""
     try:
-        redis_client = get_redis_client()
-        messages = get_conversation(redis_client, conversation_id)
-
-        if not messages:
+        # Fetch the history and its TTL in one pipelined round-trip
+        key = get_conversation_key(conversation_id)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.ttl(key)
+            # Reading counts as activity: refresh the TTL and last-seen
+            # stamp on the same round-trip
+            pipe.expire(key, redis_config.conversation_ttl)
+            pipe.hset(_CONVERSATIONS_META, conversation_id, datetime.now().timestamp())
+            data, ttl, _, _ = await pipe.execute()
+
+        if not data:
             raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
 
-        # Get TTL information
-        key = get_conversation_key(conversation_id)
-        ttl = redis_client.ttl(key)
+        messages = [_deserialize_msg(msg) for msg in data]
 
         if ttl > 0:
             expires_at = (datetime.now() + timedelta(seconds=ttl)).isoformat()
         else:
             expires_at = None
 
-        return ConversationResponse(
+        # The history came out of our own Redis store, so skip validation
+        return ConversationResponse.model_construct(
             conversation_id=conversation_id,
             messages=messages,
             created_at=datetime.now().isoformat(),
@@ -295,34 +680,126 @@ async def get_conversation_history(
 
 
 @app.delete("/v1/conversations/{conversation_id}")
-async def delete_conversation(conversation_id: str, api_key: str = Depends(get_openai_api_key)):
+async def delete_conversation(
+    conversation_id: str,
+    api_key: str = Depends(get_openai_api_key),
+    redis_client: aioredis.Redis = Depends(get_binary_redis_client),
+):
     """Delete a specific conversation history"""
     try:
-        redis_client = get_redis_client()
         key = get_conversation_key(conversation_id)
 
-        # Check if conversation exists
-        if not redis_client.exists(key):
+        # UNLINK reclaims large list memory off the main thread, and like
+        # DELETE reports how many keys it removed, so no EXISTS probe needed
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.unlink(key)
+            pipe.srem(_CONVERSATIONS_INDEX, conversation_id)
+            pipe.hdel(_CONVERSATIONS_META, conversation_id)
+            deleted, _, _ = await pipe.execute()
+        if not deleted:
             raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
 
-        # Delete the conversation
-        redis_client.delete(key)
-
         return {"status": "success", "message": f"Conversation {conversation_id} deleted"}
     except redis.RedisError as e:
         raise HTTPException(status_code=500, detail=f"Redis error: {str(e)}")
 
 
-@app.get("/v1/conversations", response_model=List[str])
-async def list_conversations(api_key: str = Depends(get_openai_api_key)):
-    """List all conversation IDs"""
+@app.get("/v1/conversations")
+async def list_conversations(
+    include_metadata: bool = False,
+    api_key: str = Depends(get_openai_api_key),
+    redis_client: aioredis.Redis = Depends(get_redis_client),
+):
+    """List all conversation IDs, optionally with expiry metadata"""
+    try:
+        # One O(entities) SMEMBERS on the index instead of walking the
+        # whole keyspace
+        conversation_ids = list(await redis_client.smembers(_CONVERSATIONS_INDEX))
+        if not conversation_ids:
+            # Migration fallback for data written before the index existed;
+            # SCAN iterates incrementally instead of blocking Redis the way
+            # KEYS does
+            conversation_ids = [
+                key.split(":", 1)[1]
+                async for key in redis_client.scan_iter(match="conversation:*", count=500)
+            ]
+        keys = [get_conversation_key(conversation_id) for conversation_id in conversation_ids]
+
+        if not include_metadata:
+            return conversation_ids
+
+        # One pipelined sweep gathers every TTL instead of a round-trip
+        # per conversation
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.ttl(key)
+            ttls = await pipe.execute()
+
+        return [
+            {
+                "conversation_id": conversation_id,
+                "expires_at": (
+                    (datetime.now() + timedelta(seconds=ttl)).isoformat() if ttl > 0 else None
+                ),
+            }
+            for conversation_id, ttl in zip(conversation_ids, ttls)
+        ]
+    except redis.RedisError as e:
+        raise HTTPException(status_code=500, detail=f"Redis error: {str(e)}")
+
+
+@app.post("/v1/models/create")
+async def create_model(
+    request: ModelConfigRequest,
+    api_key: str = Depends(get_openai_api_key),
+    redis_client: aioredis.Redis = Depends(get_binary_redis_client),
+):
+    """Store a model configuration in Redis and return its ID for reuse"""
+    model_id = uuid.uuid4().hex
+    config = {
+        "model": request.model,
+        "temperature": request.temperature,
+        "max_tokens": request.max_tokens,
+    }
     try:
-        redis_client = get_redis_client()
-        # Get all conversation keys and extract IDs
-        keys = redis_client.keys("conversation:*")
-        conversation_ids = [key.split(":", 1)[1] for key in keys]
+        await save_model_config(redis_client, model_id, config)
+    except redis.RedisError as e:
+        raise HTTPException(status_code=500, detail=f"Redis error: {str(e)}")
+
+    return {
+        "model_id": model_id,
+        "model": request.model,
+        "status": "success",
+        "message": f"Model configuration stored as {model_id}",
+    }
+
 
-        return conversation_ids
+@app.get("/v1/models")
+async def list_models(
+    api_key: str = Depends(get_openai_api_key),
+    redis_client: aioredis.Redis = Depends(get_binary_redis_client),
+):
+    """List all stored model configurations"""
+    try:
+        model_ids = [mid.decode() for mid in await redis_client.smembers(_MODELS_INDEX)]
+        if not model_ids:
+            # Migration fallback for configs written before the index existed
+            model_ids = [
+                key.split(b":", 1)[1].decode()
+                async for key in redis_client.scan_iter(match="model:*", count=500)
+            ]
+
+        if not model_ids:
+            return []
+
+        # One MGET fetches every config in a single round-trip
+        values = await redis_client.mget([get_model_key(model_id) for model_id in model_ids])
+        return [
+            {"model_id": model_id, "config": _decode_payload(data)}
+            for model_id, data in zip(model_ids, values)
+            # Expired configs may linger in the index; skip them
+            if data is not None
+        ]
     except redis.RedisError as e:
         raise HTTPException(status_code=500, detail=f"Redis error: {str(e)}")
 
@@ -330,4 +807,18 @@ async def list_conversations(api_key: str = Depends(get_openai_api_key)):
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("langchain_server:app", host="0.0.0.0", port=8000, reload=True)
+    if os.environ.get("PROD") == "1":
+        # Default to one worker since ainvoke yields during the OpenAI
+        # round-trip and the in-process caches assume a single owner;
+        # uvloop/httptools speed up the HTTP layer either way
+        uvicorn.run(
+            "langchain_server:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=int(os.environ.get("WORKERS", 1)),
+            loop="uvloop",
+            http="httptools",
+            log_level="warning",
+        )
+    else:
+        uvicorn.run("langchain_server:app", host="0.0.0.0", port=8000, reload=True)
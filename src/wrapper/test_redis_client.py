@@ -1,9 +1,26 @@
+import atexit
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import argparse
+import orjson
 from typing import List, Dict, Optional
 
 BASE_URL = "http://localhost:8000"
 
+# One pooled session for every helper, so repeated CLI actions reuse the
+# keep-alive connection instead of handshaking per call
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.1, status_forcelist=[502, 503, 504]),
+)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+SESSION.headers.update({"Content-Type": "application/json"})
+atexit.register(SESSION.close)
+
 
 def create_model(model: str = "gpt-3.5-turbo", temperature: float = 0.7) -> Dict:
     """
@@ -23,10 +40,10 @@ def create_model(model: str = "gpt-3.5-turbo", temperature: float = 0.7) -> Dict
         "temperature": temperature,
     }
 
-    response = requests.post(url, json=payload)
+    response = SESSION.post(url, data=orjson.dumps(payload))
 
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
         print(f"Error: {response.status_code}")
         print(response.text)
@@ -67,10 +84,10 @@ def make_chat_request(
     if model_id:
         payload["model_id"] = model_id
 
-    response = requests.post(url, json=payload)
+    response = SESSION.post(url, data=orjson.dumps(payload))
 
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
         print(f"Error: {response.status_code}")
         print(response.text)
@@ -89,10 +106,10 @@ def get_conversation(conversation_id: str) -> Dict:
     """
     url = f"{BASE_URL}/v1/conversations/{conversation_id}"
 
-    response = requests.get(url)
+    response = SESSION.get(url)
 
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
         print(f"Error: {response.status_code}")
         print(response.text)
@@ -108,10 +125,10 @@ def list_conversations() -> List[str]:
     """
     url = f"{BASE_URL}/v1/conversations"
 
-    response = requests.get(url)
+    response = SESSION.get(url)
 
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
         print(f"Error: {response.status_code}")
         print(response.text)
@@ -127,10 +144,10 @@ def list_models() -> List[Dict]:
     """
     url = f"{BASE_URL}/v1/models"
 
-    response = requests.get(url)
+    response = SESSION.get(url)
 
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
         print(f"Error: {response.status_code}")
         print(response.text)
@@ -149,10 +166,10 @@ def delete_conversation(conversation_id: str) -> Dict:
     """
     url = f"{BASE_URL}/v1/conversations/{conversation_id}"
 
-    response = requests.delete(url)
+    response = SESSION.delete(url)
 
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
         print(f"Error: {response.status_code}")
         print(response.text)
@@ -7,28 +7,31 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-# Set up command line arguments
-parser = argparse.ArgumentParser(description="LangChain testbed with OpenAI models")
-parser.add_argument(
-    "--model",
-    type=str,
-    default="gpt-3.5-turbo",
-    help="OpenAI model to use (default: gpt-3.5-turbo)",
-)
-parser.add_argument(
-    "--prompt",
-    type=str,
-    default="What is capital of Hawaii",
-    help="Prompt to send to the model (default: 'What is capital of Hawaii')",
-)
-args = parser.parse_args()
 
-# Check if OpenAI API key is available
-api_key = os.environ.get("OPENAI_API_KEY")
-if not api_key:
-    print("Warning: OPENAI_API_KEY environment variable not set.")
-    print("Please set your OpenAI API key as an environment variable.")
-else:
+def main():
+    # Set up command line arguments
+    parser = argparse.ArgumentParser(description="LangChain testbed with OpenAI models")
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="gpt-3.5-turbo",
+        help="OpenAI model to use (default: gpt-3.5-turbo)",
+    )
+    parser.add_argument(
+        "--prompt",
+        type=str,
+        default="What is capital of Hawaii",
+        help="Prompt to send to the model (default: 'What is capital of Hawaii')",
+    )
+    args = parser.parse_args()
+
+    # Check if OpenAI API key is available
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        print("Warning: OPENAI_API_KEY environment variable not set.")
+        print("Please set your OpenAI API key as an environment variable.")
+        return
+
     print(f"OPENAI_API_KEY found: {api_key[:5]}...")  # Show only first few characters for security
 
     # Initialize the LLM
@@ -64,3 +67,7 @@ else:
     print("\n--- Model Info ---")
     print(f"Model: {llm.model_name}")
     print(f"Temperature: {llm.temperature}")
+
+
+if __name__ == "__main__":
+    main()
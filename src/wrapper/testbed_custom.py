@@ -1,48 +1,500 @@
-from src.wrapper.fastapi_chat import FastAPIChatOpenAI, HumanMessage
 import argparse
+import asyncio
+import hashlib
+import os
+import socket
+import sys
+import time
+from functools import lru_cache
 
-# Parse command line arguments
-parser = argparse.ArgumentParser(description="Run custom LLM testbed with specified model.")
-parser.add_argument(
-    "--model", type=str, default="gpt-3.5-turbo", help="Model to use (default: gpt-3.5-turbo)"
-)
-parser.add_argument(
-    "--prompt",
-    type=str,
-    default="What is capital of Hawaii",
-    help="Prompt to send to the model (default: 'What is capital of Hawaii')",
-)
-args = parser.parse_args()
+import orjson
+
+from src.wrapper import _exact_cache
+from src.wrapper._semantic_cache import SemanticCache
+
+# Unix socket used by the daemon mode so repeated prompts skip the
+# per-process interpreter startup and first-request handshake
+SOCKET_PATH = "/tmp/testbed.sock"
+
+# Token-exact static prefix sent with every request. Keeping it a
+# module constant (rather than interpolating per call) means the
+# server-side prefix cache stays hot across runs; any dynamic content
+# must come after it, in the user message
+SYSTEM_PROMPT = "You are a helpful assistant. Answer clearly and concisely."
+
+# Context windows for the models this testbed is pointed at; unknown
+# models fall back to the conservative default
+_MODEL_CONTEXT_LIMITS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+_DEFAULT_CONTEXT_LIMIT = 8192
+# Tokens reserved for the completion when checking prompt length
+_COMPLETION_HEADROOM = 1024
+
+
+@lru_cache(maxsize=8)
+def _encoder_for(model):
+    """Tokenizer per model name; cached since the BPE table load is slow."""
+    import tiktoken
 
-# Initialize the LLM
-llm = FastAPIChatOpenAI(
-    model=args.model,
-    temperature=0.7,
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _over_length_prompts(model, prompts):
+    """Return (prompt, token_count) pairs that exceed the model's context."""
+    limit = _MODEL_CONTEXT_LIMITS.get(model, _DEFAULT_CONTEXT_LIMIT) - _COMPLETION_HEADROOM
+    enc = _encoder_for(model)
+    over = []
+    for prompt in prompts:
+        n = len(enc.encode(prompt))
+        if n > limit:
+            over.append((prompt, n))
+    return over
+
+
+# Output-length bins for batch runs: (name, max_tokens cap, share of
+# --max-concurrency). Short answers get most of the concurrency budget
+# so they are never queued behind long generations
+_OUTPUT_BINS = (
+    ("short", 128, 0.6),
+    ("medium", 512, 0.3),
+    ("long", 2048, 0.1),
 )
 
-# Create a prompt
-prompt = args.prompt
-messages = [HumanMessage(content=prompt)]
-
-# Get the response
-print(f"\nSending prompt: '{prompt}'")
-response = llm.invoke(messages)
-
-# Display the response with metadata
-print("\n--- Response ---")
-print(f"Content: {response.content}")
-print("\n--- Metadata ---")
-for key, value in response.additional_kwargs.items():
-    print(f"{key}: {value}")
-
-# If you want to access token usage info (if available)
-if hasattr(response, "response_metadata") and response.response_metadata:
-    print("\n--- Usage Statistics ---")
-    if "token_usage" in response.response_metadata:
-        token_usage = response.response_metadata["token_usage"]
-        for k, v in token_usage.items():
-            print(f"{k}: {v}")
-
-print("\n--- Model Info ---")
-print(f"Model: {llm.model_name}")
-print(f"Temperature: {llm.temperature}")
+
+def _predict_output_tokens(prompt):
+    """Crude but monotonic: answers tend to scale with question length."""
+    return int(len(prompt.split()) * 1.5) + 32
+
+
+def _cache_key(model, temperature, prompt):
+    """sha256 over the canonical request payload for the exact cache."""
+    payload = orjson.dumps(
+        {
+            "model": model,
+            "temperature": temperature,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+        },
+        option=orjson.OPT_SORT_KEYS,
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _build_messages(prompt):
+    """Static system prefix first, dynamic user prompt after."""
+    return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=prompt)]
+
+
+def _record_metric(path, record):
+    """Append one JSON line of timing data; metrics are best-effort."""
+    if not path:
+        return
+    try:
+        with open(path, "ab") as f:
+            f.write(orjson.dumps(record) + b"\n")
+    except OSError:
+        pass
+
+
+def _dump(obj):
+    """Pretty-print a metadata dict without the stdlib json/repr path."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+
+def _display_response(response):
+    # Display the response with metadata
+    print("\n--- Response ---")
+    print(f"Content: {response.content}")
+    print("\n--- Metadata ---")
+    print(_dump(response.additional_kwargs or {}))
+
+    # If you want to access token usage info (if available)
+    if hasattr(response, "response_metadata") and response.response_metadata:
+        if "token_usage" in response.response_metadata:
+            print("\n--- Usage Statistics ---")
+            print(_dump(response.response_metadata["token_usage"]))
+
+
+async def serve(args):
+    """Run a warm daemon answering prompts over the Unix socket.
+
+    The wrapper (and its pooled HTTP connection) is created once and
+    reused for every prompt, so clients pay neither interpreter startup
+    nor connection handshake.
+    """
+    llm = FastAPIChatOpenAI(model=args.model, temperature=0.7)
+    if args.warm:
+        llm.create_model()
+
+    async def handle(reader, writer):
+        try:
+            raw = await reader.readline()
+            if not raw:
+                return
+            request = orjson.loads(raw)
+            # The blocking invoke is fine here: this is a single-user dev
+            # daemon, not a concurrent server. Each prompt is its own
+            # stateless completion — the long-lived instance must not
+            # thread unrelated clients into one conversation
+            response = llm.invoke(_build_messages(request["prompt"]), stateless=True)
+            writer.write(
+                orjson.dumps(
+                    {
+                        "content": response.content,
+                        "additional_kwargs": response.additional_kwargs or {},
+                    }
+                )
+                + b"\n"
+            )
+        except Exception as e:
+            writer.write(orjson.dumps({"error": str(e)}) + b"\n")
+        finally:
+            await writer.drain()
+            writer.close()
+
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+    server = await asyncio.start_unix_server(handle, path=SOCKET_PATH)
+    print(f"Testbed daemon listening on {SOCKET_PATH} (model: {args.model})")
+    async with server:
+        await server.serve_forever()
+
+
+def _stream_response(llm, messages, metrics_out=None):
+    """Print the completion as it arrives and report time-to-first-token.
+
+    Perceived latency becomes TTFT rather than full-response time; total
+    throughput is unchanged. Inter-token latencies are recorded when a
+    metrics file is given.
+    """
+    t0 = time.perf_counter()
+    ttft = 0.0
+    chars = 0
+    itl = []
+    last = t0
+    for chunk in llm.stream(messages):
+        now = time.perf_counter()
+        if ttft == 0.0:
+            ttft = now - t0
+        else:
+            itl.append(now - last)
+        last = now
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+        chars += len(chunk)
+    total = time.perf_counter() - t0
+    print("\n\n--- Usage Statistics ---")
+    print(f"time_to_first_token: {ttft:.3f}s")
+    print(f"total_time: {total:.3f}s")
+    print(f"output_chars: {chars}")
+    _record_metric(
+        metrics_out,
+        {"mode": "stream", "ttft": ttft, "latency": total, "itl": itl, "output_chars": chars},
+    )
+
+
+async def run_batch(args, prompts):
+    """Run several prompts concurrently over one shared async client.
+
+    Wall-clock is bounded by the slowest prompt rather than the sum,
+    since each request is an independent decode on the server side.
+    Results print in input order regardless of completion order.
+    """
+    # Deferred like the wrapper import; httpx is already loaded by then
+    import httpx
+    from tenacity import (
+        retry,
+        retry_if_exception,
+        stop_after_attempt,
+        wait_random_exponential,
+    )
+
+    def _is_retryable(exc):
+        # 429s and transient 5xx/transport failures; client errors are not
+        if isinstance(exc, httpx.HTTPStatusError):
+            status = exc.response.status_code
+            return status == 429 or status >= 500
+        return isinstance(exc, httpx.TransportError)
+
+    # One client and semaphore per output-length bin, all drawing from
+    # the same shared connection pool. Per-bin max_tokens caps and
+    # concurrency shares keep short answers from queueing behind long
+    # generations under a shared rate limit
+    bins = {}
+    for name, cap, share in _OUTPUT_BINS:
+        bins[name] = (
+            AsyncFastAPIChatOpenAI(model=args.model, temperature=0.7, max_tokens=cap),
+            asyncio.Semaphore(max(1, int(args.max_concurrency * share))),
+        )
+
+    def _bin_for(prompt):
+        predicted = _predict_output_tokens(prompt)
+        for name, cap, _ in _OUTPUT_BINS:
+            if predicted <= cap:
+                return name
+        return _OUTPUT_BINS[-1][0]
+
+    @retry(
+        wait=wait_random_exponential(multiplier=1, max=30),
+        stop=stop_after_attempt(6),
+        retry=retry_if_exception(_is_retryable),
+        reraise=True,
+    )
+    async def call(llm, prompt):
+        return await llm.ainvoke(_build_messages(prompt), stateless=True)
+
+    async def bounded(prompt):
+        llm, semaphore = bins[_bin_for(prompt)]
+        async with semaphore:
+            # Latency includes retry waits: this is the time the caller saw
+            t0 = time.perf_counter()
+            response = await call(llm, prompt)
+            _record_metric(
+                args.metrics_out,
+                {
+                    "mode": "batch",
+                    "model": args.model,
+                    "prompt_len": len(prompt),
+                    "latency": time.perf_counter() - t0,
+                },
+            )
+            return response
+
+    try:
+        responses = await asyncio.gather(
+            *(bounded(p) for p in prompts), return_exceptions=True
+        )
+    finally:
+        # All bins share one pooled client per base_url; closing any
+        # instance closes it
+        await next(iter(bins.values()))[0].aclose()
+
+    for prompt, response in zip(prompts, responses):
+        print(f"\n=== Prompt: '{prompt}' ===")
+        if isinstance(response, Exception):
+            print(f"Error: {response}")
+        else:
+            _display_response(response)
+
+
+def ask_daemon(prompt):
+    """Send the prompt to a running daemon; returns None if unavailable."""
+    if not os.path.exists(SOCKET_PATH):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(SOCKET_PATH)
+            sock.sendall(orjson.dumps({"prompt": prompt}) + b"\n")
+            chunks = []
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                chunks.append(data)
+                if data.endswith(b"\n"):
+                    break
+        return orjson.loads(b"".join(chunks))
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def build_parser():
+    """Build the argument parser once; driver scripts calling main() in a
+    loop reuse the cached instance."""
+    # fromfile_prefix_chars lets sweeps live in a file: python testbed_custom.py @sweep.conf
+    parser = argparse.ArgumentParser(
+        description="Run custom LLM testbed with specified model.",
+        fromfile_prefix_chars="@",
+    )
+    parser.add_argument(
+        "--model", type=str, default="gpt-3.5-turbo", help="Model to use (default: gpt-3.5-turbo)"
+    )
+    parser.add_argument(
+        "--prompt",
+        type=str,
+        nargs="+",
+        default=["What is capital of Hawaii"],
+        help="Prompt(s) to send to the model; several run concurrently "
+        "(default: 'What is capital of Hawaii')",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        type=str,
+        help="Append one JSON line of latency/TTFT data per call to this file",
+    )
+    parser.add_argument(
+        "--prompts-file",
+        type=str,
+        help="File with one prompt per line, run concurrently as a batch",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the response token by token and report time-to-first-token",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=20,
+        help="Maximum in-flight requests when running several prompts (default: 20)",
+    )
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="Reuse (or create) a server-side model configuration via the on-disk model_id cache",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help=f"Run as a warm daemon answering prompts over {SOCKET_PATH}",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Import the wrapper only once arguments are valid: --help and bad
+    # invocations exit without paying the httpx/pydantic import cost
+    global AIMessage, AsyncFastAPIChatOpenAI, FastAPIChatOpenAI, HumanMessage, SystemMessage
+    from src.wrapper.fastapi_chat import (
+        AIMessage,
+        AsyncFastAPIChatOpenAI,
+        FastAPIChatOpenAI,
+        HumanMessage,
+        SystemMessage,
+    )
+
+    if args.serve:
+        asyncio.run(serve(args))
+        return
+
+    prompts = args.prompt
+    if args.prompts_file:
+        with open(args.prompts_file) as f:
+            prompts = [line.strip() for line in f if line.strip()]
+        if not prompts:
+            print(f"No prompts found in {args.prompts_file}")
+            return
+
+    # Catch over-length prompts locally: one tokenizer pass (<1 ms) beats
+    # a full round-trip that can only come back as a 400
+    too_long = _over_length_prompts(args.model, prompts)
+    if too_long:
+        for prompt, n in too_long:
+            print(
+                f"Prompt is {n} tokens, over the context limit for {args.model}: "
+                f"'{prompt[:60]}...'"
+            )
+        return
+
+    if len(prompts) > 1:
+        asyncio.run(run_batch(args, prompts))
+        return
+
+    prompt = prompts[0]
+    print(f"\nSending prompt: '{prompt}'")
+
+    # Streaming skips the daemon and caches: chunks go straight to the
+    # terminal as they arrive
+    if args.stream:
+        llm = FastAPIChatOpenAI(model=args.model, temperature=0.7)
+        _stream_response(llm, _build_messages(prompt), metrics_out=args.metrics_out)
+        return
+
+    # Prefer a running daemon so this process skips the handshake entirely
+    daemon_result = ask_daemon(prompt)
+    if daemon_result is not None:
+        if "error" in daemon_result:
+            print(f"Daemon error: {daemon_result['error']}")
+            return
+        print("\n--- Response (via daemon) ---")
+        print(f"Content: {daemon_result['content']}")
+        print("\n--- Metadata ---")
+        print(_dump(daemon_result["additional_kwargs"]))
+        return
+
+    # Exact-match replay: identical (model, temperature, prompt) runs are
+    # served from disk without touching the network
+    key = _cache_key(args.model, 0.7, prompt)
+    cached = _exact_cache.get(key)
+    if cached is not None:
+        print("(served from exact-match cache)")
+        _display_response(
+            AIMessage(
+                content=cached["content"],
+                additional_kwargs=cached.get("additional_kwargs") or {},
+                response_metadata=cached.get("response_metadata") or {},
+            )
+        )
+        return
+
+    # Paraphrase replay: a prompt close enough to an earlier one reuses
+    # its response (no-op unless sentence-transformers is installed)
+    semantic_cache = SemanticCache()
+    cached = semantic_cache.lookup(args.model, prompt)
+    if cached is not None:
+        print("(served from semantic cache)")
+        _display_response(
+            AIMessage(
+                content=cached["content"],
+                additional_kwargs=cached.get("additional_kwargs") or {},
+                response_metadata=cached.get("response_metadata") or {},
+            )
+        )
+        return
+
+    # Initialize the LLM
+    llm = FastAPIChatOpenAI(
+        model=args.model,
+        temperature=0.7,
+    )
+    if args.warm:
+        model_id = llm.create_model()
+        if model_id:
+            print(f"Using model configuration: {model_id}")
+
+    # Get the response
+    messages = _build_messages(prompt)
+    t0 = time.perf_counter()
+    # Stateless, so repeated identical prompts on a reused instance (e.g.
+    # drivers calling main() in a loop) can hit the in-memory cache
+    response = llm.invoke(messages, stateless=True)
+    latency = time.perf_counter() - t0
+    token_usage = (response.response_metadata or {}).get("token_usage", {})
+    _record_metric(
+        args.metrics_out,
+        {
+            "mode": "invoke",
+            "model": args.model,
+            "prompt_len": len(prompt),
+            "latency": latency,
+            "output_tokens": token_usage.get("completion_tokens"),
+        },
+    )
+    resp_dict = {
+        "content": response.content,
+        "additional_kwargs": response.additional_kwargs,
+        "response_metadata": response.response_metadata,
+    }
+    _exact_cache.set(key, resp_dict)
+    semantic_cache.store(args.model, prompt, resp_dict)
+    _display_response(response)
+
+    print("\n--- Model Info ---")
+    print(f"Model: {llm.model_name}")
+    print(f"Temperature: {llm.temperature}")
+
+
+if __name__ == "__main__":
+    main()